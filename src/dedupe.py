@@ -0,0 +1,154 @@
+import hashlib
+import random
+import re
+from array import array
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .utils import normalize_and_tokenize
+
+# Query parameters that only track the click and never change the article
+TRACKING_PARAMS = {"fbclid", "gclid", "ssm", "sma", "prm", "rel", "ref", "event_log", "outputtype"}
+TRACKING_PREFIXES = ("utm_", "mc_")
+
+# Bodies shorter than this (cartoons, paywalled teasers) are too small to
+# fingerprint reliably; such articles are deduped on URL only
+MIN_BODY_TOKENS = 50
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def canonicalize_url(url: str) -> str:
+    """Normalize an article URL so aliases of the same page compare equal."""
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    if path.endswith("/index.html"):
+        path = path[: -len("index.html")]
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    query = sorted(
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    )
+    return urlunsplit(("https", host, path, urlencode(query), ""))
+
+
+def url_id(url: str) -> int:
+    """64-bit id of an article's canonical URL, used as the index key."""
+    return _hash64(canonicalize_url(url))
+
+
+def _hash64(s: str) -> int:
+    # Stable across processes, unlike the builtin hash()
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+@lru_cache(maxsize=None)
+def _permutations(num_perm: int) -> List[Tuple[int, int]]:
+    # Fixed seed so fingerprints are comparable across runs
+    rng = random.Random(0x5EED)
+    return [
+        (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+        for _ in range(num_perm)
+    ]
+
+
+def minhash(text: str, num_perm: int = 32, shingle_size: int = 3) -> Optional[List[int]]:
+    """MinHash signature over word shingles of `text`. Returns None for empty text."""
+    tokens = normalize_and_tokenize(text)
+    if not tokens:
+        return None
+    if len(tokens) < shingle_size:
+        shingles = {" ".join(tokens)}
+    else:
+        shingles = {" ".join(tokens[i:i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)}
+    hashes = [_hash64(sh) for sh in shingles]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _permutations(num_perm)]
+
+
+def article_fingerprint(
+    title: str,
+    body: str,
+    bands: int = 8,
+    rows: int = 4,
+    min_body_tokens: int = MIN_BODY_TOKENS,
+) -> Optional[List[int]]:
+    """Fingerprint an article as `bands` 64-bit LSH band hashes of its MinHash.
+
+    Returns None when the body has fewer than `min_body_tokens` words, since
+    a title alone is not enough to tell two articles apart.
+    """
+    if len(normalize_and_tokenize(body)) < min_body_tokens:
+        return None
+    signature = minhash(f"{title or ''}\n{body}", num_perm=bands * rows)
+    return [
+        _hash64(",".join(map(str, signature[b * rows:(b + 1) * rows])))
+        for b in range(bands)
+    ]
+
+
+class NearDuplicateIndex:
+    """Compact MinHash-LSH index of article fingerprints.
+
+    Each band hash is bucketed by its low `bucket_bits` bits. Buckets are
+    chains threaded through flat arrays, with the high 32 bits kept as a tag
+    to confirm a match. An article is a near-duplicate of a stored one when at
+    least `min_matches` bands agree. With 8 bands of 4 rows and
+    min_matches=2, pairs with Jaccard similarity >= 0.85 over word 3-shingles
+    are almost always caught and pairs below 0.5 almost never are.
+
+    Per article this stores an 8-byte key plus a 4-byte tag and a 4-byte chain
+    link per band (72 bytes with the defaults). The bucket heads add a fixed
+    bands * 2**bucket_bits * 4 bytes (2 MB with the defaults).
+    """
+
+    def __init__(self, bands: int = 8, min_matches: int = 2, bucket_bits: int = 16):
+        if not 1 <= min_matches <= bands:
+            raise ValueError("min_matches must be between 1 and bands")
+        self.bands = bands
+        self.min_matches = min_matches
+        self._mask = (1 << bucket_bits) - 1
+        self._keys = array("Q")
+        self._heads = [array("i", [-1]) * (1 << bucket_bits) for _ in range(bands)]
+        self._links = [array("i") for _ in range(bands)]
+        self._tags = [array("I") for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def find(self, fingerprint: List[int]) -> Optional[int]:
+        """Return the key of a stored near-duplicate of `fingerprint`, or None."""
+        matches: Dict[int, int] = {}
+        for b, h in enumerate(fingerprint):
+            tag = h >> 32
+            tags, links = self._tags[b], self._links[b]
+            row = self._heads[b][h & self._mask]
+            while row != -1:
+                if tags[row] == tag:
+                    count = matches.get(row, 0) + 1
+                    if count >= self.min_matches:
+                        return self._keys[row]
+                    matches[row] = count
+                row = links[row]
+        return None
+
+    def add(self, fingerprint: List[int], key: int) -> None:
+        """Store `fingerprint` under the 64-bit `key` (e.g. `url_id(url)`)."""
+        if len(fingerprint) != self.bands:
+            raise ValueError(f"expected {self.bands} band hashes, got {len(fingerprint)}")
+        row = len(self._keys)
+        self._keys.append(key)
+        for b, h in enumerate(fingerprint):
+            bucket = h & self._mask
+            self._links[b].append(self._heads[b][bucket])
+            self._tags[b].append(h >> 32)
+            self._heads[b][bucket] = row
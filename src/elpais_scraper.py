@@ -1,16 +1,20 @@
 import os
 import time
 from collections import Counter
-from typing import List
+from typing import List, Optional
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
 
 from .utils import download_image, normalize_and_tokenize
 from .translator import translate_many
+from .throttle import get_throttle, throttle_metrics
+from .dedupe import NearDuplicateIndex, article_fingerprint, canonicalize_url, url_id
 
 
 def setup_local_driver(headless: bool = True) -> webdriver.Chrome:
@@ -33,16 +37,77 @@ def setup_local_driver(headless: bool = True) -> webdriver.Chrome:
     return driver
 
 
-def scrape_first_n_opinion_articles(driver: webdriver.Chrome, n: int = 5) -> List[dict]:
-    """Scrape first n articles from El País Opinion section."""
+LISTING_SELECTOR = "article h2 a, article h3 a"
+
+
+def _response_status(driver: webdriver.Chrome) -> Optional[int]:
+    """HTTP status of the current page from the Navigation Timing API, if exposed."""
+    try:
+        status = driver.execute_script(
+            "const nav = performance.getEntriesByType('navigation')[0];"
+            " return nav ? nav.responseStatus : null;"
+        )
+    except Exception:
+        return None
+    return status if isinstance(status, int) and status > 0 else None
+
+
+def _load_page(driver: webdriver.Chrome, url: str, ready: tuple) -> None:
+    """Navigate to `url` under its host throttle and wait for `ready` to render.
+
+    Only the navigation itself counts as latency. The response status feeds
+    the throttle; when the browser doesn't expose it, a page where `ready`
+    never appears counts as an error. Raises TimeoutError when the host is
+    backed off for longer than the throttle will wait.
+    """
+    throttle = get_throttle(url)
+    throttle.acquire()
+    start = time.monotonic()
+    try:
+        driver.get(url)
+    except Exception:
+        throttle.release(time.monotonic() - start, error=True, kind="page")
+        raise
+    latency = time.monotonic() - start
+
+    status = _response_status(driver)
+    try:
+        WebDriverWait(driver, 10).until(EC.presence_of_element_located(ready))
+        rendered = True
+    except Exception:
+        rendered = bool(driver.find_elements(*ready))
+    throttle.release(
+        latency, status=status, error=status is None and not rendered, kind="page"
+    )
+
+
+def scrape_first_n_opinion_articles(
+    driver: webdriver.Chrome, n: int = 5, index: Optional[NearDuplicateIndex] = None
+) -> List[dict]:
+    """Scrape first n articles from El País Opinion section.
+
+    Links are deduped on their canonical URL, and articles whose title/body
+    fingerprint is a near-duplicate of one already in `index` are skipped
+    before their image is downloaded. Articles with too little body text to
+    fingerprint are deduped on URL only. Pass a shared `index` to dedupe
+    across calls.
+    """
+    if index is None:
+        index = NearDuplicateIndex()
     opinion_url = "https://elpais.com/opinion/"
-    driver.get(opinion_url)
-    time.sleep(2)
+    # Navigation shares the per-host throttle with image/HTTP fetches
+    try:
+        _load_page(driver, opinion_url, (By.CSS_SELECTOR, LISTING_SELECTOR))
+    except TimeoutError as e:
+        print(f"Opinion page unavailable: {e}")
+        return []
 
     # Find all article links - look for h2/h3 with links (article headlines)
     # Store both href and the title text from the homepage
-    anchors = driver.find_elements(By.CSS_SELECTOR, "article h2 a, article h3 a")
+    anchors = driver.find_elements(By.CSS_SELECTOR, LISTING_SELECTOR)
     article_data = []  # List of (href, homepage_title) tuples
+    seen_urls = set()  # Canonical URLs already queued or scraped
+    scraped_links = {}  # url_id -> link, for reporting duplicates
 
     for a in anchors:
         h = a.get_attribute("href")
@@ -68,29 +133,38 @@ def scrape_first_n_opinion_articles(driver: webdriver.Chrome, n: int = 5) -> Lis
             # Skip section pages - they end with just /opinion/something/
             # Articles have dates like /opinion/2025-11-01/...
             if any(char.isdigit() for char in h.split("/opinion/")[-1][:20]):
-                # Check if already added
-                if not any(href == h for href, _ in article_data):
+                # Check if already added (tracking params, www., etc. ignored)
+                canonical = canonicalize_url(h)
+                if canonical not in seen_urls:
+                    seen_urls.add(canonical)
                     article_data.append((h, homepage_title))
-        
-        if len(article_data) >= n:
-            break
 
+    # Keep all candidates so near-duplicates can be replaced by later links
     results = []
 
-    for link, homepage_title in article_data[:n]:
+    for link, homepage_title in article_data:
+        if len(results) >= n:
+            break
         print(f"Scraping: {link}")
         print(f"  Homepage title: '{homepage_title}'")
-        driver.get(link)
-        
-        # Wait for page to load
         try:
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.TAG_NAME, "h1"))
-            )
+            _load_page(driver, link, (By.TAG_NAME, "h1"))
+        except TimeoutError as e:
+            # Host is backed off; keep what was already scraped
+            print(f"  Stopping with {len(results)} articles: {e}")
+            break
+
+        # Section aliases resolve to the same rel=canonical URL
+        try:
+            canonical_link = driver.find_element(By.XPATH, "//link[@rel='canonical']")
+            canonical = canonicalize_url(canonical_link.get_attribute("href"))
+            if canonical and canonical != canonicalize_url(link):
+                if canonical in seen_urls:
+                    print(f"  Skipping duplicate of {canonical}")
+                    continue
+                seen_urls.add(canonical)
         except Exception:
             pass
-        
-        time.sleep(2)  # Additional wait for JS
 
         # Title - try multiple selectors with fallbacks
         title = ""
@@ -148,6 +222,20 @@ def scrape_first_n_opinion_articles(driver: webdriver.Chrome, n: int = 5) -> Lis
             except Exception:
                 body = ""
 
+        # Near-duplicate check before any image/translation work
+        fingerprint = article_fingerprint(title, body)
+        if fingerprint is not None:
+            duplicate_of = index.find(fingerprint)
+            if duplicate_of is not None:
+                # The index only keeps URL hashes; matches from earlier calls
+                # can't be named, so report the article being skipped instead
+                earlier = scraped_links.get(duplicate_of, "an article indexed earlier")
+                print(f"  Skipping {link}: near-duplicate of {earlier}")
+                continue
+            key = url_id(link)
+            index.add(fingerprint, key)
+            scraped_links[key] = link
+
         # Image
         image_url = None
         try:
@@ -218,6 +306,14 @@ def main(headless: bool = True, translate: bool = True):
         else:
             print("No words repeated more than twice")
 
+        print("\nPer-host fetch metrics:")
+        for host, m in throttle_metrics().items():
+            print(
+                f"{host}: {m['requests']} requests, {m['errors']} errors "
+                f"({m['throttled']} x 429), avg {m['avg_latency']:.2f}s, "
+                f"concurrency {m['concurrency']}, interval {m['interval']:.2f}s"
+            )
+
         return scraped, translated, analysis
     finally:
         driver.quit()
@@ -0,0 +1,234 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+
+class HostThrottle:
+    """Per-host concurrency and rate controller with AIMD adaptation.
+
+    Healthy responses (fast, non-error) additively widen the concurrency
+    window and shorten the gap between requests. Errors, 429/5xx responses
+    and slow responses multiplicatively shrink the window and lengthen the gap.
+
+    "Slow" is judged per fetch kind (e.g. "page", "image", "api") against an
+    EWMA of that kind's recent latency, so a steady multi-second page load is
+    healthy while a sudden jump is not. Callers can pass an explicit
+    `target_latency` instead.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        min_interval: float = 0.1,
+        max_interval: float = 10.0,
+        initial_interval: float = 1.0,
+        max_concurrency: int = 8,
+        interval_step: float = 0.1,
+        backoff_factor: float = 2.0,
+        slow_factor: float = 2.0,
+        ewma_alpha: float = 0.2,
+        acquire_timeout: float = 60.0,
+        retry_backoff: float = 2.0,
+    ):
+        self.host = host
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_concurrency = max_concurrency
+        self.interval_step = interval_step
+        self.backoff_factor = backoff_factor
+        self.slow_factor = slow_factor
+        self.ewma_alpha = ewma_alpha
+        self.acquire_timeout = acquire_timeout
+        self.retry_backoff = retry_backoff
+
+        self.interval = initial_interval
+        self.window = 1.0  # Allowed in-flight requests (fractional for AIMD)
+        self.in_flight = 0
+        self._next_slot = 0.0
+        self._throttled_streak = 0  # Consecutive 429s
+        self._cond = threading.Condition()
+
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.slow = 0
+        self.total_latency = 0.0
+        self.baselines: Dict[str, float] = {}  # EWMA latency per fetch kind
+
+    def acquire(self, timeout: Optional[float] = None) -> None:
+        """Block until a concurrency slot is free and the rate gap has passed.
+
+        Raises TimeoutError if that would take longer than `timeout` seconds
+        (default `acquire_timeout`), so a stalled host cannot hang a caller
+        such as a remote WebDriver session.
+        """
+        if timeout is None:
+            timeout = self.acquire_timeout
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.in_flight >= max(1, int(self.window)):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    raise TimeoutError(f"timed out waiting for a {self.host} slot")
+            now = time.monotonic()
+            start = max(now, self._next_slot)
+            if start > deadline:
+                raise TimeoutError(f"{self.host} is backed off for {start - now:.1f}s")
+            self.in_flight += 1
+            self._next_slot = start + self.interval
+        delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def release(
+        self,
+        latency: float,
+        status: Optional[int] = None,
+        error: bool = False,
+        retry_after: Optional[float] = None,
+        kind: str = "default",
+        target_latency: Optional[float] = None,
+    ) -> None:
+        """Free a slot and adapt the window/interval from the observed outcome."""
+        with self._cond:
+            self.in_flight -= 1
+            self.requests += 1
+            self.total_latency += latency
+
+            if status == 429:
+                self.throttled += 1
+                self._throttled_streak += 1
+                # Without Retry-After, wait at least 2s, 4s, 8s... (capped)
+                if not retry_after:
+                    retry_after = min(
+                        self.max_interval,
+                        self.retry_backoff * 2 ** (self._throttled_streak - 1),
+                    )
+            else:
+                self._throttled_streak = 0
+
+            if error or (status is not None and (status == 429 or status >= 500)):
+                self.errors += 1
+                self._decrease()
+                if retry_after:
+                    self._next_slot = max(self._next_slot, time.monotonic() + retry_after)
+            else:
+                baseline = self.baselines.get(kind)
+                if target_latency is not None:
+                    slow = latency > target_latency
+                else:
+                    slow = baseline is not None and latency > baseline * self.slow_factor
+                if baseline is None:
+                    self.baselines[kind] = latency
+                else:
+                    self.baselines[kind] = baseline + self.ewma_alpha * (latency - baseline)
+
+                if slow:
+                    self.slow += 1
+                    self._decrease()
+                else:
+                    self._increase()
+
+            self._cond.notify_all()
+
+    def _increase(self) -> None:
+        self.window = min(self.max_concurrency, self.window + 1.0 / self.window)
+        self.interval = max(self.min_interval, self.interval - self.interval_step)
+
+    def _decrease(self) -> None:
+        self.window = max(1.0, self.window / self.backoff_factor)
+        self.interval = min(self.max_interval, self.interval * self.backoff_factor)
+
+    def metrics(self) -> dict:
+        """Snapshot of counters and current control state."""
+        with self._cond:
+            return {
+                "host": self.host,
+                "requests": self.requests,
+                "errors": self.errors,
+                "throttled": self.throttled,
+                "slow": self.slow,
+                "avg_latency": self.total_latency / self.requests if self.requests else 0.0,
+                "concurrency": max(1, int(self.window)),
+                "interval": self.interval,
+                "in_flight": self.in_flight,
+                "baselines": dict(self.baselines),
+            }
+
+
+class _Outcome:
+    """Holds what the caller observed for a single throttled request."""
+
+    def __init__(self):
+        self.status: Optional[int] = None
+        self.retry_after: Optional[float] = None
+
+    def record(self, status: int, retry_after: Optional[str] = None) -> None:
+        self.status = status
+        try:
+            self.retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            self.retry_after = None  # HTTP-date form is ignored
+
+
+_throttles: Dict[str, HostThrottle] = {}
+_registry_lock = threading.Lock()
+
+
+def _host_of(url_or_host: str) -> str:
+    return (urlsplit(url_or_host).hostname or url_or_host).lower()
+
+
+def get_throttle(url_or_host: str) -> HostThrottle:
+    """Return the shared throttle for the host of `url_or_host`."""
+    host = _host_of(url_or_host)
+    with _registry_lock:
+        throttle = _throttles.get(host)
+        if throttle is None:
+            throttle = HostThrottle(host)
+            _throttles[host] = throttle
+        return throttle
+
+
+@contextmanager
+def throttled(url: str, kind: str = "default", target_latency: Optional[float] = None):
+    """Run a fetch of `url` under its host's throttle.
+
+    `kind` groups fetches whose latencies are comparable ("page", "image",
+    "api"); `target_latency` overrides the adaptive slowness threshold.
+    Yields an outcome object; call `record(status, retry_after)` on it when an
+    HTTP status is available. Exceptions raised inside the block count as errors.
+    """
+    throttle = get_throttle(url)
+    throttle.acquire()
+    outcome = _Outcome()
+    start = time.monotonic()
+    try:
+        yield outcome
+    except Exception:
+        throttle.release(
+            time.monotonic() - start, status=outcome.status, error=True, kind=kind
+        )
+        raise
+    throttle.release(
+        time.monotonic() - start,
+        status=outcome.status,
+        retry_after=outcome.retry_after,
+        kind=kind,
+        target_latency=target_latency,
+    )
+
+
+def throttle_metrics() -> Dict[str, dict]:
+    """Per-host metrics for every host fetched so far."""
+    with _registry_lock:
+        throttles = list(_throttles.values())
+    return {t.host: t.metrics() for t in throttles}
+
+
+def reset_throttles() -> None:
+    """Forget all per-host state (mainly for tests)."""
+    with _registry_lock:
+        _throttles.clear()
@@ -70,6 +70,8 @@ import requests
 import time
 from typing import List
 
+from .throttle import throttled
+
 RAPIDAPI_KEY = os.getenv("RAPIDAPI_KEY")
 RAPIDAPI_HOST = os.getenv("RAPIDAPI_HOST")
 
@@ -90,13 +92,14 @@ def translate_with_rapidapi_single(
     
     for attempt in range(retries):
         try:
-            resp = requests.post(url, json=payload, headers=headers, timeout=20)
+            with throttled(url, kind="api") as outcome:
+                resp = requests.post(url, json=payload, headers=headers, timeout=20)
+                outcome.record(resp.status_code, resp.headers.get("Retry-After"))
             
-            # If rate limited, wait and retry
+            # If rate limited, retry; the shared throttle applies the backoff
+            # (Retry-After and a doubled request gap) before the next attempt
             if resp.status_code == 429:
-                wait_time = (attempt + 1) * 2  # 2, 4, 6 seconds
-                print(f"Rate limited, waiting {wait_time}s before retry {attempt + 1}/{retries}")
-                time.sleep(wait_time)
+                print(f"Rate limited, retry {attempt + 1}/{retries}")
                 continue
             
             resp.raise_for_status()
@@ -133,9 +136,7 @@ def translate_with_rapidapi_single(
             
         except requests.exceptions.HTTPError as e:
             if e.response.status_code == 429 and attempt < retries - 1:
-                wait_time = (attempt + 1) * 2
-                print(f"Rate limited, waiting {wait_time}s before retry {attempt + 1}/{retries}")
-                time.sleep(wait_time)
+                print(f"Rate limited, retry {attempt + 1}/{retries}")
             else:
                 raise
     
@@ -144,9 +145,12 @@ def translate_with_rapidapi_single(
 
 
 def translate_many(
-    texts: List[str], from_lang: str = "es", to_lang: str = "en", delay: float = 0.5
+    texts: List[str], from_lang: str = "es", to_lang: str = "en", delay: float = 0.0
 ) -> List[str]:
-    """Translate multiple texts with delay between requests to avoid rate limiting."""
+    """Translate multiple texts; the shared API host throttle paces requests.
+
+    `delay` adds an optional fixed pause between requests on top of that.
+    """
     out = []
     for i, t in enumerate(texts):
         if t:  # Only translate non-empty strings
@@ -160,7 +164,7 @@ def translate_many(
             out.append("")
         
         # Add delay between requests (except for last one)
-        if i < len(texts) - 1:
+        if delay and i < len(texts) - 1:
             time.sleep(delay)
     
     return out
\ No newline at end of file
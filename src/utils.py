@@ -4,6 +4,8 @@ import requests
 from pathlib import Path
 from typing import Optional, List
 
+from .throttle import throttled
+
 
 def download_image(url: str, dest_folder: str = "images") -> Optional[str]:
     """Download image at `url` to `dest_folder`. Returns local path or None."""
@@ -13,7 +15,9 @@ def download_image(url: str, dest_folder: str = "images") -> Optional[str]:
     filename = os.path.basename(url.split("?")[0])
     local_path = Path(dest_folder) / filename
     try:
-        r = requests.get(url, timeout=20)
+        with throttled(url, kind="image") as outcome:
+            r = requests.get(url, timeout=20)
+            outcome.record(r.status_code, r.headers.get("Retry-After"))
         r.raise_for_status()
         local_path.write_bytes(r.content)
         return str(local_path)
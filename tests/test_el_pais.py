@@ -1,3 +1,5 @@
+import random
+import threading
 import unittest
 from unittest.mock import Mock, patch
 from src.elpais_scraper import (
@@ -5,6 +7,8 @@ from src.elpais_scraper import (
     analyze_translated_headers,
 )
 from src.utils import normalize_and_tokenize
+from src.dedupe import NearDuplicateIndex, article_fingerprint, canonicalize_url
+from src.throttle import HostThrottle, get_throttle, reset_throttles, throttle_metrics, throttled
 
 class TestElPaisScraper(unittest.TestCase):
     """Unit tests for El País scraper functionality."""
@@ -50,5 +54,393 @@ class TestElPaisScraper(unittest.TestCase):
         self.assertEqual(len(result["counts"]), 0)
 
 
+class TestHostThrottle(unittest.TestCase):
+    """Unit tests for the adaptive per-host throttle."""
+
+    def setUp(self):
+        reset_throttles()
+        sleep_patcher = patch("src.throttle.time.sleep")
+        self.sleep = sleep_patcher.start()
+        self.addCleanup(sleep_patcher.stop)
+
+    def _fetch(self, t, latency, **kwargs):
+        t.acquire()
+        t.release(latency, **kwargs)
+
+    def test_success_increases_throughput(self):
+        """Healthy responses widen concurrency and shorten the gap."""
+        t = HostThrottle("elpais.com", initial_interval=1.0, interval_step=0.1)
+        for _ in range(10):
+            self._fetch(t, 0.1, status=200)
+        self.assertGreater(t.window, 2.0)
+        self.assertLess(t.interval, 1.0)
+
+    def test_rate_limit_backs_off(self):
+        """A 429 halves concurrency and doubles the request gap."""
+        t = HostThrottle("elpais.com", initial_interval=1.0, interval_step=0.0)
+        for _ in range(6):
+            self._fetch(t, 0.1, status=200)
+        window = t.window
+        self._fetch(t, 0.1, status=429)
+        self.assertEqual(t.window, max(1.0, window / 2))
+        self.assertEqual(t.interval, 2.0)
+        self.assertEqual(t.metrics()["throttled"], 1)
+
+    def test_latency_spike_backs_off(self):
+        """Latency well above the kind's recent baseline is treated as congestion."""
+        t = HostThrottle("elpais.com", initial_interval=1.0, interval_step=0.0)
+        for _ in range(5):
+            self._fetch(t, 1.0, kind="page")
+        self._fetch(t, 5.0, kind="page")
+        self.assertEqual(t.interval, 2.0)
+        self.assertEqual(t.metrics()["slow"], 1)
+
+    def test_explicit_target_latency(self):
+        """A caller-supplied target overrides the adaptive baseline."""
+        t = HostThrottle("elpais.com", initial_interval=1.0)
+        self._fetch(t, 5.0, target_latency=1.0)
+        self.assertEqual(t.interval, 2.0)
+        self.assertEqual(t.metrics()["slow"], 1)
+
+    def test_steady_page_latency_does_not_back_off(self):
+        """Steady multi-second page loads are healthy, not a reason to slow down."""
+        t = HostThrottle("elpais.com", initial_interval=1.0)
+        for _ in range(20):
+            self._fetch(t, 4.0, kind="page", status=200)
+        self.assertEqual(t.metrics()["slow"], 0)
+        self.assertEqual(t.interval, t.min_interval)
+        self.assertGreater(t.window, 1.0)
+
+    def test_kinds_have_separate_baselines(self):
+        """Fast image fetches do not make page loads look slow."""
+        t = HostThrottle("elpais.com")
+        for _ in range(5):
+            self._fetch(t, 0.1, kind="image")
+        self._fetch(t, 4.0, kind="page")
+        self.assertEqual(t.metrics()["slow"], 0)
+
+    def test_acquire_blocks_when_window_full(self):
+        """A second acquire waits for a release, or times out."""
+        t = HostThrottle("elpais.com")
+        t.acquire()
+        # Clock jumps past the deadline, so the wait gives up without sleeping
+        with patch("src.throttle.time.monotonic", side_effect=[100.0, 200.0]):
+            with self.assertRaises(TimeoutError):
+                t.acquire(timeout=5)
+
+        # Release only once the waiter is parked in the condition wait
+        waiting = threading.Event()
+        wait = t._cond.wait
+
+        def signalling_wait(timeout=None):
+            waiting.set()
+            return wait(timeout)
+
+        t._cond.wait = signalling_wait
+        waiter = threading.Thread(target=t.acquire, kwargs={"timeout": 30})
+        waiter.start()
+        self.assertTrue(waiting.wait(30))
+        t.release(0.1)
+        waiter.join(30)
+        self.assertFalse(waiter.is_alive())
+        self.assertEqual(t.in_flight, 1)
+
+    def test_rate_limit_without_retry_after_has_backoff_floor(self):
+        """429s without Retry-After defer the next slot by 2s, then 4s."""
+        t = HostThrottle("elpais.com", initial_interval=0.1)
+        with patch("src.throttle.time.monotonic", return_value=100.0):
+            self._fetch(t, 0.1, status=429)
+            t.acquire()
+            self.sleep.assert_called_with(2.0)
+            t.release(0.1, status=429)
+            t.acquire()
+            self.sleep.assert_called_with(4.0)
+
+    def test_rate_gap_between_requests(self):
+        """Back-to-back requests are spaced by the current interval."""
+        t = HostThrottle("elpais.com", initial_interval=1.0)
+        with patch("src.throttle.time.monotonic", return_value=100.0):
+            self._fetch(t, 0.1)
+            self.sleep.assert_not_called()
+            t.acquire()
+        self.sleep.assert_called_once_with(1.0)
+
+    def test_retry_after_defers_next_slot(self):
+        """Retry-After pushes the next slot out, bounded by the acquire timeout."""
+        t = HostThrottle("elpais.com", initial_interval=1.0)
+        with patch("src.throttle.time.monotonic", return_value=100.0):
+            self._fetch(t, 0.1, status=429, retry_after=30)
+            with self.assertRaises(TimeoutError):
+                t.acquire(timeout=10)
+            t.acquire(timeout=60)
+        self.sleep.assert_called_once_with(30.0)
+
+    def test_throttled_shares_state_per_host(self):
+        """URLs on the same host share one throttle and report metrics."""
+        self.assertIs(
+            get_throttle("https://elpais.com/opinion/"),
+            get_throttle("https://ELPAIS.com/opinion/2025-11-01/x.html"),
+        )
+        with throttled("https://imagenes.elpais.com/a.jpg", kind="image") as outcome:
+            outcome.record(200)
+        with self.assertRaises(RuntimeError):
+            with throttled("https://imagenes.elpais.com/b.jpg", kind="image"):
+                raise RuntimeError("boom")
+        metrics = throttle_metrics()["imagenes.elpais.com"]
+        self.assertEqual(metrics["requests"], 2)
+        self.assertEqual(metrics["errors"], 1)
+        self.assertEqual(metrics["in_flight"], 0)
+
+
+PENSIONES = (
+    "El Gobierno ha presentado hoy un plan para reformar el sistema de pensiones que "
+    "incluye cambios en la edad de jubilación y en las cotizaciones de los trabajadores "
+    "autónomos durante los próximos diez años. La ministra defendió en el Congreso que "
+    "la reforma es imprescindible para garantizar la sostenibilidad de las cuentas "
+    "públicas, mientras la oposición acusó al Ejecutivo de improvisar y de no haber "
+    "negociado con los agentes sociales.\n\n"
+    "Los sindicatos han anunciado movilizaciones para el mes que viene si no se retira "
+    "el aumento de la edad mínima, y las organizaciones empresariales piden que el coste "
+    "no recaiga sobre las pequeñas empresas. Según los cálculos del propio ministerio, "
+    "el gasto en pensiones alcanzará el quince por ciento del producto interior bruto "
+    "a mediados de la próxima década, una cifra que Bruselas considera difícil de "
+    "asumir sin medidas adicionales.\n\n"
+    "Los expertos consultados coinciden en que el debate llega tarde y en que cualquier "
+    "solución duradera exigirá un pacto amplio que sobreviva a los cambios de gobierno."
+)
+
+VIVIENDA = (
+    "La subida de los alquileres en las grandes ciudades ha convertido el acceso a la "
+    "vivienda en la principal preocupación de los jóvenes, según la última encuesta del "
+    "instituto de estadística. En Madrid y Barcelona el precio medio por metro cuadrado "
+    "se ha duplicado en apenas una década, mientras los salarios apenas han crecido.\n\n"
+    "Los ayuntamientos reclaman más competencias para limitar los pisos turísticos y "
+    "ampliar el parque público, que sigue siendo uno de los más pequeños de Europa. El "
+    "sector inmobiliario advierte de que los topes a los precios reducen la oferta y "
+    "empujan a los propietarios a retirar sus viviendas del mercado de alquiler."
+)
+
+
+class TestDedupe(unittest.TestCase):
+    """Unit tests for canonical URLs and near-duplicate detection."""
+
+    def test_canonicalize_url_strips_tracking(self):
+        """Tracking params, www., fragments and trailing slashes are ignored."""
+        base = "https://elpais.com/opinion/2025-11-01/el-triunfo.html"
+        self.assertEqual(canonicalize_url(base + "?utm_source=twitter&ssm=TW#comentarios"), base)
+        self.assertEqual(canonicalize_url("http://www.ELPAIS.com/opinion/2025-11-01/el-triunfo.html/"), base)
+        self.assertNotEqual(canonicalize_url(base + "?page=2"), base)
+
+    def test_edited_article_is_near_duplicate(self):
+        """An article with an edited sentence matches; an unrelated one does not."""
+        index = NearDuplicateIndex()
+        index.add(article_fingerprint("Reforma de las pensiones", PENSIONES), 1)
+        edited = PENSIONES.replace(
+            "La ministra defendió en el Congreso",
+            "La ministra de Seguridad Social defendió ayer en el Senado",
+        )
+        self.assertEqual(index.find(article_fingerprint("La reforma de las pensiones", edited)), 1)
+        self.assertIsNone(index.find(article_fingerprint("Vivienda", VIVIENDA)))
+        self.assertEqual(len(index), 1)
+
+    def test_recall_on_lightly_edited_bodies(self):
+        """Bodies with 2% of words replaced are caught without false positives."""
+        rng = random.Random(7)
+        vocab = normalize_and_tokenize(PENSIONES + " " + VIVIENDA) + [f"palabra{i}" for i in range(3000)]
+        index = NearDuplicateIndex()
+        detected = 0
+        for key in range(30):
+            words = [rng.choice(vocab) for _ in range(700)]
+            index.add(article_fingerprint("", " ".join(words)), key)
+            for i in rng.sample(range(700), 14):
+                words[i] = rng.choice(vocab)
+            detected += index.find(article_fingerprint("", " ".join(words))) == key
+
+        unrelated = [
+            index.find(article_fingerprint("", " ".join(rng.choice(vocab) for _ in range(700))))
+            for _ in range(30)
+        ]
+        self.assertGreaterEqual(detected, 27)
+        self.assertEqual(unrelated, [None] * 30)
+
+    def test_short_body_has_no_fingerprint(self):
+        """Articles without enough body text are never content-deduped."""
+        self.assertIsNone(article_fingerprint("El Roto", ""))
+        self.assertIsNone(article_fingerprint("El Roto", "Viñeta del día"))
+
+
+def _fake_driver(listing, pages):
+    """Mock WebDriver serving an opinion listing and article pages by URL."""
+    driver = Mock()
+    current = {}
+    driver.get.side_effect = lambda url: current.update(url=url)
+    driver.execute_script.side_effect = lambda script: pages.get(current["url"], {}).get("status")
+    driver.find_elements.return_value = [
+        Mock(text=f"Titular {i}", get_attribute=Mock(return_value=href))
+        for i, href in enumerate(listing)
+    ]
+
+    def find_element(by, selector):
+        url = current["url"]
+        page = pages[url]
+        if "canonical" in selector:
+            return Mock(get_attribute=Mock(return_value=page.get("canonical", url)))
+        if selector == "h1":
+            return Mock(text=page["title"])
+        if selector == "article":
+            paragraphs = [Mock(text=p) for p in page.get("body", "").split("\n\n")]
+            return Mock(find_elements=Mock(return_value=paragraphs))
+        if "og:image" in selector:
+            return Mock(get_attribute=Mock(return_value=page["image"]))
+        raise Exception(f"no element {selector}")
+
+    driver.find_element.side_effect = find_element
+    return driver
+
+
+@patch("src.elpais_scraper.WebDriverWait")
+@patch("src.elpais_scraper.download_image", side_effect=lambda url: f"images/{url[-5:]}")
+@patch("src.throttle.time.sleep")
+class TestScrapeDedupe(unittest.TestCase):
+    """Tests for duplicate handling in scrape_first_n_opinion_articles."""
+
+    BASE = "https://elpais.com/opinion/2025-11-0"
+
+    def setUp(self):
+        reset_throttles()
+
+    def _page(self, title, body, image, **extra):
+        return dict(title=title, body=body, image=f"https://imagenes.elpais.com/{image}", **extra)
+
+    def _scraped_urls(self, driver):
+        return [c.args[0] for c in driver.get.call_args_list[1:]]
+
+    def test_tracking_param_variants_scraped_once(self, sleep, download, wait):
+        """Listing links differing only by tracking params are scraped once."""
+        a, b = f"{self.BASE}1/a.html", f"{self.BASE}2/b.html"
+        driver = _fake_driver(
+            [f"{a}?utm_source=home", f"https://www.elpais.com/opinion/2025-11-01/a.html?ssm=TW", a, b],
+            {
+                f"{a}?utm_source=home": self._page("A", PENSIONES, "a.jpg", canonical=a),
+                b: self._page("B", VIVIENDA, "b.jpg"),
+            },
+        )
+        results = scrape_first_n_opinion_articles(driver, n=5)
+        self.assertEqual([r["title_es"] for r in results], ["A", "B"])
+        self.assertEqual(self._scraped_urls(driver), [f"{a}?utm_source=home", b])
+
+    def test_canonical_alias_skipped(self, sleep, download, wait):
+        """A page whose rel=canonical was already seen is skipped."""
+        a, alias = f"{self.BASE}1/a.html", f"{self.BASE}1/editoriales/a.html"
+        driver = _fake_driver(
+            [a, alias],
+            {
+                a: self._page("A", PENSIONES, "a.jpg"),
+                alias: self._page("A", PENSIONES, "alias.jpg", canonical=a),
+            },
+        )
+        results = scrape_first_n_opinion_articles(driver, n=5)
+        self.assertEqual([r["url"] for r in results], [a])
+        download.assert_called_once_with("https://imagenes.elpais.com/a.jpg")
+
+    def test_near_duplicate_skipped_before_image_download(self, sleep, download, wait):
+        """Near-duplicates are skipped before download and scanning continues to n."""
+        a, c, d, e = (f"{self.BASE}{i}/{x}.html" for i, x in enumerate("acde", start=1))
+        edited = PENSIONES.replace("hoy", "este lunes")
+        driver = _fake_driver(
+            [a, c, d, e],
+            {
+                a: self._page("Pensiones", PENSIONES, "a.jpg"),
+                c: self._page("Pensiones (actualizado)", edited, "c.jpg"),
+                d: self._page("Vivienda", VIVIENDA, "d.jpg"),
+                e: self._page("Otro", VIVIENDA + " Fin.", "e.jpg"),
+            },
+        )
+        results = scrape_first_n_opinion_articles(driver, n=2)
+        self.assertEqual([r["url"] for r in results], [a, d])
+        self.assertEqual(
+            [c.args[0] for c in download.call_args_list],
+            ["https://imagenes.elpais.com/a.jpg", "https://imagenes.elpais.com/d.jpg"],
+        )
+        self.assertEqual(self._scraped_urls(driver), [a, c, d])
+
+    def test_shared_index_dedupes_across_calls(self, sleep, download, wait):
+        """A shared index catches duplicates of articles from an earlier call."""
+        a, c = f"{self.BASE}1/a.html", f"{self.BASE}2/c.html"
+        pages = {
+            a: self._page("Pensiones", PENSIONES, "a.jpg"),
+            c: self._page("Pensiones", PENSIONES.replace("hoy", "este lunes"), "c.jpg"),
+        }
+        index = NearDuplicateIndex()
+        scrape_first_n_opinion_articles(_fake_driver([a], pages), n=5, index=index)
+        with patch("builtins.print") as printed:
+            results = scrape_first_n_opinion_articles(_fake_driver([c], pages), n=5, index=index)
+        self.assertEqual(results, [])
+        printed.assert_any_call(f"  Skipping {c}: near-duplicate of an article indexed earlier")
+
+    def test_short_pages_with_same_title_kept(self, sleep, download, wait):
+        """Cartoons with no body and the same headline are not content-deduped."""
+        a, b = f"{self.BASE}1/vineta.html", f"{self.BASE}2/vineta.html"
+        driver = _fake_driver(
+            [a, b],
+            {a: self._page("El Roto", "", "a.jpg"), b: self._page("El Roto", "", "b.jpg")},
+        )
+        results = scrape_first_n_opinion_articles(driver, n=5)
+        self.assertEqual([r["url"] for r in results], [a, b])
+
+
+@patch("src.elpais_scraper.WebDriverWait")
+@patch("src.elpais_scraper.download_image", return_value=None)
+@patch("src.throttle.time.sleep")
+class TestScrapeThrottling(unittest.TestCase):
+    """Tests for throttled navigation in scrape_first_n_opinion_articles."""
+
+    BASE = "https://elpais.com/opinion/2025-11-0"
+
+    def setUp(self):
+        reset_throttles()
+
+    def test_backed_off_host_returns_partial_results(self, sleep, download, wait):
+        """A Retry-After beyond acquire_timeout stops scraping, keeping results."""
+        a, b = f"{self.BASE}1/a.html", f"{self.BASE}2/b.html"
+
+        def rate_limited_image(url):
+            with throttled(url, kind="image") as outcome:
+                outcome.record(429, "120")
+
+        download.side_effect = rate_limited_image
+        driver = _fake_driver(
+            [a, b],
+            {
+                a: dict(title="A", body=PENSIONES, image="https://elpais.com/a.jpg"),
+                b: dict(title="B", body=VIVIENDA, image="https://elpais.com/b.jpg"),
+            },
+        )
+        results = scrape_first_n_opinion_articles(driver, n=5)
+        self.assertEqual([r["url"] for r in results], [a])
+        self.assertNotIn(b, [c.args[0] for c in driver.get.call_args_list])
+
+    def test_page_status_feeds_throttle(self, sleep, download, wait):
+        """A 503 page is counted as an error even though it loaded quickly."""
+        a = f"{self.BASE}1/a.html"
+        driver = _fake_driver(
+            [a], {a: dict(title="A", body=PENSIONES, image="x.jpg", status=503)}
+        )
+        scrape_first_n_opinion_articles(driver, n=5)
+        metrics = throttle_metrics()["elpais.com"]
+        self.assertEqual(metrics["requests"], 2)
+        self.assertEqual(metrics["errors"], 1)
+
+    def test_missing_content_is_error_without_status(self, sleep, download, wait):
+        """Without a status, a page whose h1 never renders counts as an error."""
+        a = f"{self.BASE}1/a.html"
+        wait.return_value.until.side_effect = [None, Exception("no h1")]
+        driver = _fake_driver([a], {a: dict(title="A", body=PENSIONES, image="x.jpg")})
+        anchors = driver.find_elements.return_value
+        driver.find_elements.side_effect = lambda by, selector: [] if selector == "h1" else anchors
+        scrape_first_n_opinion_articles(driver, n=5)
+        self.assertEqual(throttle_metrics()["elpais.com"]["errors"], 1)
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file